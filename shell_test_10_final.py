@@ -1,10 +1,50 @@
 
 ##############################################################################################################################
 import opensees.openseespy as ops  # Import OpenSeesPy module
-import numpy as np                  # For numerical operations (unused in this snippet)
-import math                         # For floating-point comparisons
+import numpy as np                  # For vectorized node matching and load aggregation
 import csv                          # For writing CSV outputs
 import os                           # For filesystem operations
+import math                         # For the integer step count
+import argparse                     # For command-line options
+import sys                          # For detecting interactive runs
+
+# Numeric helpers: pure numpy, kept separate from the OpenSees calls
+def _match_coords(coords, target, tol):
+    # Row indices of coords lying within distance tol of target (squared distances, no sqrt)
+    d = coords - target
+    return np.flatnonzero((d*d).sum(axis=1) < tol*tol)
+
+def _aggregate_loads(ele_node_array):
+    # Unique node tags and how many elements share each one
+    return np.unique(ele_node_array, return_counts=True)
+
+def _next_increment(n_conv, n, k, n_ok, converged, k_max):
+    # Adaptive ramp in integer units of dp_min: next (k, n_ok) after trying a step n_conv -> n.
+    # A failure halves the increment actually tried (the clamp at n_max may make it smaller
+    # than k), k == 0 meaning give up; three converged steps in a row grow k, up to k_max
+    if not converged:
+        return (n - n_conv) // 2, 0
+    n_ok += 1
+    if n_ok >= 3 and k < k_max:
+        return min(max(k + 1, k*3//2), k_max), 0
+    return k, n_ok
+
+# ASDConcrete3D tension (T) and compression (C) backbones: strain (e), stress (s), damage (d)
+_ASD_TE = (0.0, 9e-05, 0.00015, 0.00507, 0.0250501, 0.250501)
+_ASD_TS = (0.0, 2.7, 3.0, 0.6, 0.003, 0.003)
+_ASD_TD = (0.0, 0.0, 0.0, 0.960552268244576, 0.9999800399998403, 0.9999995660869531)
+_ASD_CE = (0.0, 0.0005, 0.0006666666666666666, 0.0008333333333333333, 0.001, 0.0011666666666666665,
+           0.0013333333333333333, 0.0015, 0.0016666666666666666, 0.0018333333333333333, 0.002,
+           0.18327272727272728, 0.18377272727272728)
+_ASD_CS = (0.0, 15.0, 19.282032302755088, 22.459666924148337, 24.852813742385703, 26.6515138991168,
+           27.979589711327122, 28.92304845413264, 29.54451150103322, 29.891252930760572, 30.0, 3.0, 3.0)
+_ASD_CD = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -2.220446049250313e-16, 0.0, 0.0,
+           0.9981618744961699, 0.9981786141748574)
+
+# Flag/value arguments for nDMaterial ASDConcrete3D after (tag, E, v), assembled once at import
+_ASD_CONCRETE3D_ARGS = ('-Te', *_ASD_TE, '-Ts', *_ASD_TS, '-Td', *_ASD_TD,
+                        '-Ce', *_ASD_CE, '-Cs', *_ASD_CS, '-Cd', *_ASD_CD,
+                        '-autoRegularization', 8.97663211186248)
 
 ############################
 # Start of model generation#
@@ -28,16 +68,7 @@ def create_model(walk_edge=False):
         model.uniaxialMaterial('Elastic', 2, 30000.0)
         
     else:
-        model.eval(rf"""
-            nDMaterial ASDConcrete3D 1 {Econcr} 0.2 \
-            -Te 0.0 9e-05 0.00015 0.00507 0.0250501 0.250501 \
-            -Ts 0.0   2.7     3.0     0.6 0.003 0.003 \
-            -Td 0.0 0.0 0.0 0.960552268244576 0.9999800399998403 0.9999995660869531 \
-            -Ce 0.0 0.0005 0.0006666666666666666 0.0008333333333333333 0.001 0.0011666666666666665 0.0013333333333333333 0.0015 0.0016666666666666666 0.0018333333333333333 0.002 0.18327272727272728 0.18377272727272728 \
-            -Cs 0.0 15.0 19.282032302755088 22.459666924148337 24.852813742385703 26.6515138991168 27.979589711327122 28.92304845413264 29.54451150103322 29.891252930760572 30.0 3.0 3.0 \
-            -Cd 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 -2.220446049250313e-16 0.0 0.0 0.9981618744961699 0.9981786141748574 \
-            -autoRegularization 8.97663211186248
-        """)
+        model.nDMaterial('ASDConcrete3D', 1, Econcr, 0.2, *_ASD_CONCRETE3D_ARGS)
 
         model.uniaxialMaterial('Steel01', 2, 60.0, 30000.0, 0.01)
 
@@ -54,10 +85,11 @@ def create_model(walk_edge=False):
                 3, rebar,
                 1, cover_1)
         
-
-    model.uniaxialMaterial("Concrete01", 6, -6.0, -0.004, -5.0, -0.014)
-    model.section('Fiber', 5, '-GJ', 1.0)
-    model.patch('rect', 6, 10, 10, -0.5, -0.5, 0.5, 0.5)
+    # Fiber section for the edge frame only
+    if walk_edge:
+        model.uniaxialMaterial("Concrete01", 6, -6.0, -0.004, -5.0, -0.014)
+        model.section('Fiber', 5, '-GJ', 1.0)
+        model.patch('rect', 6, 10, 10, -0.5, -0.5, 0.5, 0.5)
 
     # Geometry--------------------------------------------------------------------------------------------------------------------------
     nx, ny = 10, 10
@@ -71,8 +103,9 @@ def create_model(walk_edge=False):
     surface = model.surface((nx, ny), element='ShellMITC4', args=(1,), points=points)
 
     # Optional edge frame
-    for nodes in surface.walk_edge():
-        model.element('PrismFrame', None, nodes, section=5, vertical=[0, 0, 1])
+    if walk_edge:
+        for nodes in surface.walk_edge():
+            model.element('PrismFrame', None, nodes, section=5, vertical=[0, 0, 1])
 
 
     #------------------------------------------------------------------------------------------------------------------------------
@@ -80,140 +113,219 @@ def create_model(walk_edge=False):
     model.fixZ( 0.0  , 1,1,1, 1,1,1)
     model.fixZ(72.111*12, 1,1,1, 1,1,1)
 
+    # Node tags and coordinates are gathered once; they are reused for matching and output
+    tags = np.fromiter(model.getNodeTags(), dtype=np.int64)
+    coords = np.array([model.nodeCoord(int(nid)) for nid in tags], dtype=np.float64)
+
     def fix_at(x0, y0, z0, tol):
-        fixed = []
-        for nid in model.getNodeTags():
-            x, y, z = model.nodeCoord(nid)
-            if (math.isclose(x, x0, abs_tol=tol) and
-                math.isclose(y, y0, abs_tol=tol) and
-                math.isclose(z, z0, abs_tol=tol)):
-                fixed.append(nid)
-        for n in fixed:
-            model.fix(n, 1,1,1, 1,1,1)
+        for n in tags[_match_coords(coords, (x0, y0, z0), tol)]:
+            model.fix(int(n), 1,1,1, 1,1,1)
 
     fix_at(-33.282*12, 0.0, 49.923*12, tol=1e-1)
     fix_at( 33.282*12, 0.0, 22.077*12, tol=1e-1)
     fix_at(  0.0  , 0.0, 36.0555*12, tol=1)
 
-    return model
+    return model, tags, coords
 #---------------------------------------------------------------------------------------------------------------------------------------
-def static_analysis(model, p):
-    # Load pattern
-    #model.pattern('Plain', 1, 'Linear')
-    # 1) Define a linear ramp from 0 → 1
+# Linear system choices; Mumps and PETSc need an OpenSees build configured with them,
+# otherwise setup_analysis falls back to UmfPack.
+# The nonlinear concrete tangent is unsymmetric, so the Krylov option uses BiCGStab with BoomerAMG.
+SYSTEMS = {
+    'umfpack'  : ('UmfPack',),
+    'mumps'    : ('Mumps',),
+    'petsc-lu' : ('PETSc', '-ksp_type', 'preonly', '-pc_type', 'lu'),
+    'petsc-amg': ('PETSc', '-ksp_type', 'bcgs', '-pc_type', 'hypre', '-pc_hypre_type', 'boomeramg'),
+}
+
+def _omp_threads():
+    # First level of OMP_NUM_THREADS (it may be empty or a nested list such as "4,2"); 1 if unusable
+    value = os.environ.get('OMP_NUM_THREADS', '').split(',')[0].strip()
+    return int(value) if value.isdigit() and int(value) > 0 else 1
+
+def setup_analysis(model, solver='umfpack', nthreads=None):
+    # Analysis components and loads are defined once; each step only advances the load factor
+    # 1) Count how many elements share each node so every node is loaded exactly once
+    ele_node_array = np.concatenate([model.eleNodes(ele) for ele in model.getEleTags()])
+    nids, weights = _aggregate_loads(ele_node_array)
+
+    # 2) Linear series: load factor equals the pseudo-time, i.e. the current pressure p
     model.timeSeries('Linear', 1)
 
-    # 2) Create a plain load pattern that uses series tag=1
+    # 3) Reference loads for unit pressure
     model.pattern('Plain', 1, 1)
-
-    ele_tags = model.getEleTags()
-    for ele in ele_tags:
-        nids = model.eleNodes(ele)
-        # Distribute pressure p as nodal force
-        for nid in nids:
-            model.load(nid, 0.0, -p, 0.0, 0.0, 0.0, 0.0, pattern=1)
+    for nid, w in zip(nids.tolist(), weights.tolist()):
+        model.load(nid, 0.0, -float(w), 0.0, 0.0, 0.0, 0.0, pattern=1)
 
     # Define analysis components
-    model.integrator('LoadControl', 1.0, 1, 1.0, 10.0)
+    model.integrator('LoadControl', 0.0)
     model.test("NormDispIncr", 1.0e-2, 30, 2)
-    model.algorithm('Newton')
+    model.algorithm('ModifiedNewton')
     model.numberer('RCM')
     model.constraints('Plain')
-    model.system('SparseGeneral', '-piv')
+    system = SYSTEMS[solver]
+    if solver.startswith('petsc') and nthreads is None:
+        nthreads = _omp_threads()
+    if solver.startswith('petsc') and nthreads > 1:
+        # Threaded SpMV/preconditioner inside PETSc; the Python driver itself stays serial
+        system += ('-threadcomm_type', 'openmp', '-threadcomm_nthreads', str(nthreads))
+    try:
+        model.system(*system)
+    except Exception as e:
+        if solver == 'umfpack':
+            raise
+        # Mumps/PETSc missing from this build, or rejected options; use the default direct solver
+        print(f"System for solver '{solver}' failed ({e}), falling back to UmfPack")
+        model.system(*SYSTEMS['umfpack'])
     model.analysis('Static')
-    return model.analyze(1)
+
+
+def static_analysis(model, p, algo='ModifiedNewton'):
+    # Step the load factor from its current value up to pressure p
+    dlam = p - model.getTime()
+    model.integrator('LoadControl', dlam, 1, dlam, dlam)
+
+    # Near-elastic steps converge without re-forming the tangent every iteration;
+    # setup_analysis installed ModifiedNewton, so the algorithm is only replaced on promotion
+    res = model.analyze(1)
+    if res != 0 and algo != 'Newton':
+        # Retry the step with full Newton and keep it for the remaining steps
+        algo = 'Newton'
+        model.algorithm(algo)
+        res = model.analyze(1)
+    return res, algo
+
+def write_displacements(model, fname, node_tags, fmt='npy'):
+    # One nodeDisp call per node; rows are built first and written in a single batch
+    rows = [(nid, *model.nodeDisp(nid)[:3]) for nid in node_tags]
+    if fmt == 'csv':
+        with open(fname, 'w', newline='', buffering=1 << 20) as f_disp:
+            writer = csv.writer(f_disp)
+            writer.writerow(['Node', 'ux', 'uy', 'uz'])
+            writer.writerows(rows)
+    else:
+        # Binary (N, 4) float64 array with columns Node, ux, uy, uz
+        np.save(fname, np.array(rows, dtype=np.float64))
 
 ##############################################################################################
 
 def main():
-    # 1) Write out the node coordinates once
-    model0 = create_model()
+    ap = argparse.ArgumentParser(description='Nonlinear pressure ramp on the reinforced concrete shell.')
+    ap.add_argument('--target-nid', type=int,
+                    help='node whose displacement history is recorded (default: prompt, or mid-span node)')
+    ap.add_argument('--dp', type=float, default=0.45,
+                    help='nominal pressure increment (default: 0.45)')
+    ap.add_argument('--pmax', type=float, default=5.0,
+                    help='final pressure (default: 5.0)')
+    ap.add_argument('--dump-every', type=int, default=0, metavar='K',
+                    help='write full-field displacements every K steps (default: final step only)')
+    ap.add_argument('--format', choices=('npy', 'csv'), default='npy',
+                    help='file format of the full-field displacement dumps (default: npy)')
+    ap.add_argument('--no-dump', action='store_true',
+                    help='never write full-field displacements')
+    ap.add_argument('--no-edge-frame', action='store_true',
+                    help='omit the PrismFrame edge beams and their fiber section')
+    ap.add_argument('--solver', choices=sorted(SYSTEMS), default='umfpack',
+                    help='linear system solver (Mumps/PETSc fall back to UmfPack if unavailable)')
+    ap.add_argument('--threads', type=int,
+                    help='OpenMP threads for the PETSc solvers (default: $OMP_NUM_THREADS or 1)')
+    args = ap.parse_args()
+    if not args.dp > 0:
+        ap.error('--dp must be positive')
+    if not args.pmax > 0:
+        ap.error('--pmax must be positive')
+
+    # 1) Build the model once and write out the node coordinates
+    model, tags, coords = create_model(walk_edge=not args.no_edge_frame)
+    setup_analysis(model, args.solver, args.threads)
+
     coord_fname = 'node_coordinates.csv'
-    with open(coord_fname, 'w', newline='') as f_coord:
-        writer = csv.writer(f_coord)
-        writer.writerow(['Node', 'x', 'y', 'z'])
-        for nid in model0.getNodeTags():
-            x, y, z = model0.nodeCoord(nid)
-            writer.writerow([nid, x, y, z])
+    with open(coord_fname, 'w', newline='', buffering=1 << 20) as f_coord:
+        np.savetxt(f_coord, np.column_stack([tags, coords]), delimiter=',',
+                   fmt=['%d', '%.15g', '%.15g', '%.15g'], header='Node,x,y,z', comments='')
     print(f"Wrote {coord_fname} in {os.getcwd()}")
 
-    # 2) Ask which node to track
-    target_nid = int(input('Enter node number to track displacement: '))
+    # 2) Node to track: command line, then prompt if interactive, else the node at mid-span
+    #    of the free edge between corners 1 and 2
+    target_nid = args.target_nid
+    if target_nid is None and sys.stdin.isatty():
+        target_nid = int(input('Enter node number to track displacement: '))
+    if target_nid is None:
+        mid_span = (-33.282*12/2, 0.0, 49.923*12/2)
+        target_nid = int(tags[np.argmin(((coords - mid_span)**2).sum(axis=1))])
+        print(f"Tracking node {target_nid} (nearest to mid-span)")
+    if target_nid not in set(tags.tolist()):
+        ap.error(f'node {target_nid} does not exist in the model')
     linear = False
-    if linear:
-        history_fname = f'node_{target_nid}_disp_history_linear.csv'
-    else:
-        history_fname = f'node_{target_nid}_disp_history_nonlinear.csv'
-
-    with open(history_fname, 'w', newline='') as f_hist:
-        hist_writer = csv.writer(f_hist)
-        hist_writer.writerow(['Iteration', 'p', 'ux', 'uy', 'uz'])
-
-        # 3) Ramp p from 0 up to 5 (inclusive), step dp
-        p   = 0.0    # starting pressure
-        dp  = 0.45   # pressure increment
+    suffix = 'linear' if linear else 'nonlinear'
+    history_fname = f'node_{target_nid}_disp_history_{suffix}.csv'
+
+    node_tags = tags.tolist()
+    node_disp = model.nodeDisp
+    history = []
+    last_itr, last_p = 0, 0.0   # last converged step
+    last_dumped_itr  = 0        # last step whose full field was written
+    try:
+        # 3) Ramp p up to pmax (inclusive), adapting the step dp. Pressures are integer
+        #    multiples of dp_min so repeated increments never accumulate rounding error
+        k_max  = 64                                   # nominal increment, in units of dp_min
+        dp_min = args.dp / k_max
+        n_max  = math.ceil(args.pmax/dp_min - 1e-9)   # final pressure, in units of dp_min
+        n_conv = 0         # last converged pressure, in units of dp_min
+        k      = k_max     # current increment, in units of dp_min
+        n_ok   = 0         # consecutive converged steps at the current increment
         itr = 1
-        while p <= 5.0:
-            model = create_model()
+        algo = 'ModifiedNewton'
+        while n_conv < n_max:
+            n = min(n_conv + k, n_max)
+            p = min(n*dp_min, args.pmax)
             try:
-                res = static_analysis(model, p)
+                res, algo = static_analysis(model, p, algo)
             except Exception as e:
                 print(f"Analysis threw exception at p={p:.3f}: {e}")
                 break
 
-            # Non‑zero return → failure to converge
+            # Non‑zero return → the analysis reverts to the last converged state;
+            # bisect the attempted increment and retry from there
+            k, n_ok = _next_increment(n_conv, n, k, n_ok, res == 0, k_max)
             if res != 0:
-                print(f"Analysis failed to converge at iteration {itr}, p = {p:.3f}")
-                break
-
-            # 4a) Write full displacements for all nodes
-            linear = False 
-            if linear:
-                disp_fname = f'node_displacements_{itr}_linear.csv'
-                with open(disp_fname, 'w', newline='') as f_disp:
-                    writer = csv.writer(f_disp)
-                    writer.writerow(['Node', 'ux', 'uy', 'uz'])
-                    for nid in model.getNodeTags():
-                        ux = model.nodeDisp(nid, 1)
-                        uy = model.nodeDisp(nid, 2)
-                        uz = model.nodeDisp(nid, 3)
-                        writer.writerow([nid, ux, uy, uz])
+                if k == 0:
+                    print(f"Analysis failed to converge at iteration {itr}, p = {p:.3f}")
+                    break
+                print(f"No convergence at p = {p:.3f}, retrying with dp = {k*dp_min:.4f}")
+                continue
+            n_conv = n
+
+            # 4a) Write full displacements for all nodes (every K steps and the final step)
+            dump = not args.no_dump and (
+                (args.dump_every > 0 and itr % args.dump_every == 0) or n_conv == n_max)
+            if dump:
+                disp_fname = f'node_displacements_{itr}_{suffix}.{args.format}'
+                write_displacements(model, disp_fname, node_tags, args.format)
                 print(f"Wrote {disp_fname} for iteration {itr} (p = {p:.3f})")
+                last_dumped_itr = itr
+
+            # 4b) Record just the target node’s displacement
+            ux, uy, uz = node_disp(target_nid)[:3]
+            history.append((itr, round(p, 3), ux, uy, uz))
+            print(f"Recorded disp for node {target_nid} at iteration {itr}, p = {p:.3f}")
+
+            last_itr, last_p = itr, p
+            itr += 1
+
+    finally:
+        # Ramp stopped before pmax: write the last converged step, which the failed
+        # analysis reverted the model to
+        if not args.no_dump and last_itr > last_dumped_itr:
+            disp_fname = f'node_displacements_{last_itr}_{suffix}.{args.format}'
+            write_displacements(model, disp_fname, node_tags, args.format)
+            print(f"Wrote {disp_fname} for iteration {last_itr} (p = {last_p:.3f})")
+
+        # History is kept in memory and written once, even if the ramp stops early
+        with open(history_fname, 'w', newline='', buffering=1 << 16) as f_hist:
+            hist_writer = csv.writer(f_hist)
+            hist_writer.writerow(['Iteration', 'p', 'ux', 'uy', 'uz'])
+            hist_writer.writerows(history)
+        print(f"Wrote {history_fname} ({len(history)} steps)")
 
-                # 4b) Record just the target node’s displacement
-                ux = model.nodeDisp(target_nid, 1)
-                uy = model.nodeDisp(target_nid, 2)
-                uz = model.nodeDisp(target_nid, 3)
-                hist_writer.writerow([itr, round(p, 3), ux, uy, uz])
-                print(f"Recorded disp for node {target_nid} at iteration {itr}, p = {p:.3f}")
-
-                # prepare next step
-                itr += 1
-                p   += dp
-
-            else:
-                disp_fname = f'node_displacements_{itr}_nonlinear.csv'
-                with open(disp_fname, 'w', newline='') as f_disp:
-                    writer = csv.writer(f_disp)
-                    writer.writerow(['Node', 'ux', 'uy', 'uz'])
-                    for nid in model.getNodeTags():
-                        ux = model.nodeDisp(nid, 1)
-                        uy = model.nodeDisp(nid, 2)
-                        uz = model.nodeDisp(nid, 3)
-                        writer.writerow([nid, ux, uy, uz])
-                print(f"Wrote {disp_fname} for iteration {itr} (p = {p:.3f})")
-
-                # 4b) Record just the target node’s displacement
-                ux = model.nodeDisp(target_nid, 1)
-                uy = model.nodeDisp(target_nid, 2)
-                uz = model.nodeDisp(target_nid, 3)
-                hist_writer.writerow([itr, round(p, 3), ux, uy, uz])
-                print(f"Recorded disp for node {target_nid} at iteration {itr}, p = {p:.3f}")
-
-                # prepare next step
-                itr += 1
-                p   += dp
-
-                
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,36 @@
+import unittest
+
+try:
+    import shell_test_10_final as driver
+except ImportError:                 # opensees / numpy not installed
+    driver = None
+
+
+@unittest.skipIf(driver is None, "requires opensees and numpy")
+class NextIncrementTest(unittest.TestCase):
+    K_MAX = 64
+
+    def test_clamped_last_step_bisects_attempted_increment(self):
+        # Defaults (dp=0.45, pmax=5.0): last step is clamped from 704 to n_max=712
+        n_conv, k, n_ok, n_max = 704, 64, 0, 712
+        tried = []
+        while k:
+            n = min(n_conv + k, n_max)
+            tried.append(n - n_conv)
+            k, n_ok = driver._next_increment(n_conv, n, k, n_ok, False, self.K_MAX)
+        self.assertEqual(tried, [8, 4, 2, 1])
+
+    def test_failure_halves_unclamped_increment(self):
+        self.assertEqual(driver._next_increment(0, 64, 64, 2, False, self.K_MAX), (32, 0))
+
+    def test_growth_after_three_converged_steps(self):
+        k, n_ok = 4, 0
+        for _ in range(3):
+            k, n_ok = driver._next_increment(0, k, k, n_ok, True, self.K_MAX)
+        self.assertEqual((k, n_ok), (6, 0))
+        self.assertEqual(driver._next_increment(0, 1, 1, 2, True, self.K_MAX), (2, 0))
+        self.assertEqual(driver._next_increment(0, 64, 64, 2, True, self.K_MAX), (64, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()